@@ -0,0 +1,2 @@
+-- CreateIndex
+CREATE UNIQUE INDEX "Payslip_payRunId_employeeId_key" ON "Payslip"("payRunId", "employeeId");
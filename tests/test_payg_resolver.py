@@ -4,7 +4,9 @@ import sys
 ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(ROOT))  # allow "tools/..." import
 
-from tools.ato_scraper.payg_resolver import withheld
+import numpy as np
+
+from tools.ato_scraper.payg_resolver import _get_df, weekly_withheld_array, withheld
 
 RATIO_M = 52.0/12.0
 
@@ -30,3 +32,17 @@ def test_scaling_consistency():
         # Monthly ~= (52/12) x weekly within 2% relative error
         rm = m / float(w)
         assert abs(rm - RATIO_M)/RATIO_M <= 0.02
+
+def test_weekly_array_matches_scalar():
+    incomes = _get_df()["income"].to_numpy(dtype=float)
+    lo, hi = incomes[0], incomes[-1]
+    points = [lo - 100, lo - 0.01, lo, lo + 0.5, hi - 0.5, hi]  # below first row and boundaries
+    points += list(incomes[1:-1:max(1, len(incomes) // 50)])    # exact table rows
+    points += [x + 0.25 for x in incomes[1:-1:max(1, len(incomes) // 50)]]  # between rows
+    got = weekly_withheld_array(points)
+    assert got.tolist() == [withheld(p, "weekly") for p in points]
+
+def test_weekly_array_above_table_is_nan():
+    hi = _get_df()["income"].iloc[-1]
+    got = weekly_withheld_array([hi + 0.01, hi * 10])
+    assert np.isnan(got).all()
@@ -0,0 +1,180 @@
+from pathlib import Path
+import sqlite3
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))  # allow "tools/..." import
+
+from tools.ato_scraper.payg_resolver import withheld
+from tools.payroll.schema import create_sqlite_schema
+from tools.payroll.ytd_reconcile import (
+    YtdState, committed_run_ids_csv, committed_run_ids_sqlite, fold_chunks, iter_payslip_chunks_csv,
+    open_state, reconcile, update_state_sqlite,
+)
+
+RUN_SQL = ('INSERT INTO "PayRun" ("id", "orgId", "periodStart", "periodEnd", "paymentDate", "status") '
+           'VALUES (?, ?, ?, ?, ?, ?)')
+SLIP_SQL = ('INSERT INTO "Payslip" ("id", "payRunId", "employeeId", "grossPay", "paygWithheld", '
+            '"superAccrued", "notesCiphertext", "notesKid") VALUES (?, ?, ?, ?, ?, 0, \'\', \'\')')
+
+# fortnightly gross 1800 -> weekly 900, inside the normalized table's range
+FORTNIGHT_GROSS = 1800.0
+FORTNIGHT_PAYG = withheld(900, "weekly") * 2
+
+
+def _db():
+    conn = sqlite3.connect(":memory:")
+    create_sqlite_schema(conn)
+    return conn
+
+
+def _add_run(conn, run_id, payment_date, status="committed", org="org_1"):
+    conn.execute(RUN_SQL, (run_id, org, payment_date, payment_date, payment_date, status))
+    conn.executemany(SLIP_SQL, [
+        (f"{run_id}-ok", run_id, "emp_ok", FORTNIGHT_GROSS, FORTNIGHT_PAYG),
+        (f"{run_id}-under", run_id, "emp_under", FORTNIGHT_GROSS, FORTNIGHT_PAYG - 50),
+        (f"{run_id}-over", run_id, "emp_over", FORTNIGHT_GROSS, FORTNIGHT_PAYG + 50),
+    ])
+
+
+def test_flags_over_and_under_withholding():
+    conn = _db()
+    _add_run(conn, "r1", "2025-07-10")
+    _add_run(conn, "r2", "2025-07-24")
+    _add_run(conn, "draft", "2025-08-07", status="draft")
+    _add_run(conn, "last_fy", "2025-06-26")
+    _add_run(conn, "other_org", "2025-07-10", org="org_2")
+
+    state = YtdState(2026, "org_1")
+    assert update_state_sqlite(state, conn, chunksize=2) == ["r1", "r2"]
+    report = reconcile(state.totals)
+
+    assert report.loc["emp_ok", "payslips"] == 2
+    assert report.loc["emp_ok", "gross_pay"] == 2 * FORTNIGHT_GROSS
+    assert report.loc["emp_ok", "expected_ytd"] == 2 * FORTNIGHT_PAYG
+    assert report.loc["emp_ok", "status"] == "ok"
+    assert report.loc["emp_under", "variance"] == -100
+    assert report.loc["emp_under", "status"] == "under"
+    assert report.loc["emp_over", "status"] == "over"
+
+
+def test_income_above_table_is_unpriced():
+    totals = fold_chunks([pd.DataFrame({
+        "employeeId": ["emp_ok", "emp_rich"],
+        "grossPay": [FORTNIGHT_GROSS, 1_000_000.0],
+        "paygWithheld": [FORTNIGHT_PAYG, 0.0],
+    })])
+    report = reconcile(totals)
+    assert report.loc["emp_ok", "status"] == "ok"
+    assert report.loc["emp_rich", "status"] == "unpriced"
+    assert np.isnan(report.loc["emp_rich", "expected_ytd"])
+    assert np.isnan(report.loc["emp_rich", "variance"])
+
+
+def test_incremental_only_folds_new_runs(tmp_path):
+    conn = _db()
+    _add_run(conn, "r1", "2025-07-10")
+    state = YtdState(2026, "org_1")
+    update_state_sqlite(state, conn)
+
+    path = tmp_path / "state.json"
+    state.save(path)
+    state = open_state(path, "org_1", 2026)
+
+    assert update_state_sqlite(state, conn) == []
+    _add_run(conn, "r2", "2025-07-24")
+    assert update_state_sqlite(state, conn) == ["r2"]
+    assert state.totals.loc["emp_ok", "payslips"] == 2
+    assert state.totals.loc["emp_over", "payg_withheld"] == 2 * (FORTNIGHT_PAYG + 50)
+
+
+def test_state_is_scoped_to_org_and_fy(tmp_path):
+    conn = _db()
+    _add_run(conn, "a1", "2025-07-10", org="org_1")
+    _add_run(conn, "b1", "2025-07-10", org="org_2")
+    state = YtdState(2026, "org_1")
+    assert update_state_sqlite(state, conn) == ["a1"]
+
+    path = tmp_path / "state.json"
+    state.save(path)
+    assert YtdState.load(path).org_id == "org_1"
+    with pytest.raises(SystemExit, match="org_2"):
+        open_state(path, "org_2", 2026)
+    with pytest.raises(SystemExit, match="FY2027"):
+        open_state(path, "org_1", 2027)
+    assert open_state(tmp_path / "missing.json", "org_2", 2026).org_id == "org_2"
+
+
+def test_failed_save_keeps_previous_state(tmp_path, monkeypatch):
+    path = tmp_path / "state.json"
+    state = YtdState(2026, "org_1", folded_run_ids={"r1"})
+    state.save(path)
+
+    def crash(*args, **kwargs):
+        raise OSError("disk full")
+
+    state.folded_run_ids.add("r2")
+    monkeypatch.setattr("tools.payroll.ytd_reconcile.os.replace", crash)
+    with pytest.raises(OSError):
+        state.save(path)
+    assert YtdState.load(path).folded_run_ids == {"r1"}
+    assert [p.name for p in tmp_path.iterdir()] == ["state.json"]
+
+
+def test_csv_source_matches_sqlite(tmp_path):
+    runs = tmp_path / "PayRun.csv"
+    slips = tmp_path / "Payslip.csv"
+    runs.write_text(
+        "id,orgId,periodStart,periodEnd,paymentDate,status\n"
+        "r1,org_1,2025-07-01,2025-07-14,2025-07-17T00:00:00Z,committed\n"
+        "r2,org_1,2025-07-15,2025-07-28,2025-07-31T00:00:00Z,draft\n",
+        encoding="utf-8",
+    )
+    slips.write_text(
+        "id,payRunId,employeeId,grossPay,paygWithheld,superAccrued,notesCiphertext,notesKid\n"
+        "s1,r1,emp_a,2400.00,300.00,0,x,k\n"
+        "s2,r2,emp_a,2400.00,300.00,0,x,k\n"
+        "s3,r1,emp_b,1000.00,0.00,0,x,k\n",
+        encoding="utf-8",
+    )
+    run_ids = committed_run_ids_csv(runs, "org_1", 2026)
+    assert run_ids == ["r1"]
+    totals = fold_chunks(iter_payslip_chunks_csv(slips, run_ids, chunksize=1))
+    assert totals.loc["emp_a", "gross_pay"] == 2400.0
+    assert totals.loc["emp_a", "payslips"] == 1
+    assert totals.loc["emp_b", "payg_withheld"] == 0.0
+
+
+# (run id, paymentDate, FY it belongs to in Australia/Sydney)
+BOUNDARY_RUNS = [
+    ("utc_before", "2025-06-30T13:59:59Z", 2025),      # 23:59:59 AEST on 30 June
+    ("utc_after", "2025-06-30T14:00:00Z", 2026),       # 00:00 AEST on 1 July
+    ("offset_after", "2025-07-01T00:00:00+10:00", 2026),
+    ("offset_utc", "2025-06-30 14:30:00+00:00", 2026),
+    ("naive_local", "2025-07-01", 2026),
+    ("next_fy", "2026-06-30T14:00:00Z", 2027),
+]
+
+
+def test_financial_year_uses_local_payment_date(tmp_path):
+    conn = _db()
+    for run_id, paid, _ in BOUNDARY_RUNS:
+        conn.execute(RUN_SQL, (run_id, "org_1", paid, paid, paid, "committed"))
+    csv_path = tmp_path / "PayRun.csv"
+    csv_path.write_text(
+        "id,orgId,periodStart,periodEnd,paymentDate,status\n"
+        + "".join(f"{r},org_1,x,x,{paid},committed\n" for r, paid, _ in BOUNDARY_RUNS),
+        encoding="utf-8",
+    )
+
+    for fy in (2025, 2026, 2027):
+        expected = {r for r, _, run_fy in BOUNDARY_RUNS if run_fy == fy}
+        assert set(committed_run_ids_sqlite(conn, "org_1", fy)) == expected
+        assert set(committed_run_ids_csv(csv_path, "org_1", fy)) == expected
+
+    # same instants seen from UTC move the first-July runs back a year
+    assert "utc_after" in committed_run_ids_sqlite(conn, "org_1", 2025, tz="UTC")
@@ -0,0 +1,153 @@
+from pathlib import Path
+import contextlib
+import sqlite3
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))  # allow "tools/..." import
+
+from tools.payroll.schema import create_sqlite_schema
+from tools.payroll.payslip_store import PayslipBackend, SqliteBackend, payslip_id, write_pay_run
+
+
+def _backend():
+    conn = sqlite3.connect(":memory:")
+    create_sqlite_schema(conn)
+    return SqliteBackend(conn)
+
+
+def _payslips(n, gross=2400.0):
+    return pd.DataFrame({
+        "employeeId": [f"emp_{i}" for i in range(n)],
+        "grossPay": gross,
+        "paygWithheld": 366.0,
+        "superAccrued": 276.0,
+        "notesCiphertext": "c",
+        "notesKid": "k",
+    })
+
+
+def _count(backend):
+    return backend.conn.execute('SELECT COUNT(*) FROM "Payslip"').fetchone()[0]
+
+
+def test_batches_and_stats():
+    backend = _backend()
+    stats = write_pay_run(backend, "r1", _payslips(25), batch_size=10)
+    assert (stats.rows, stats.batches) == (25, 3)
+    assert stats.rows_per_sec > 0
+    assert _count(backend) == 25
+
+
+def test_retry_is_idempotent_and_upserts():
+    backend = _backend()
+    write_pay_run(backend, "r1", _payslips(5), batch_size=2)
+    write_pay_run(backend, "r1", _payslips(5, gross=2500.0), batch_size=2)
+    assert _count(backend) == 5
+    gross = backend.conn.execute(
+        'SELECT "grossPay" FROM "Payslip" WHERE "id" = ?', (payslip_id("r1", "emp_3"),)
+    ).fetchone()[0]
+    assert gross == 2500.0
+
+    # same employee in another run is a distinct payslip
+    write_pay_run(backend, "r2", [dict(_payslips(1).iloc[0])])
+    assert _count(backend) == 6
+
+
+def test_retry_with_fewer_rows_drops_missing_employees():
+    backend = _backend()
+    write_pay_run(backend, "r1", _payslips(5), batch_size=2)
+    write_pay_run(backend, "r2", _payslips(5), batch_size=2)
+    stats = write_pay_run(backend, "r1", _payslips(3), batch_size=2)
+    assert stats.deleted == 2
+    remaining = backend.conn.execute(
+        'SELECT "employeeId" FROM "Payslip" WHERE "payRunId" = ? ORDER BY 1', ("r1",)
+    ).fetchall()
+    assert [e for (e,) in remaining] == ["emp_0", "emp_1", "emp_2"]
+    assert _count(backend) == 8
+
+
+def test_upserts_rows_written_with_foreign_ids():
+    backend = _backend()
+    with backend.conn:
+        backend.conn.execute(
+            'INSERT INTO "Payslip" ("id", "payRunId", "employeeId", "grossPay", "paygWithheld", '
+            '"superAccrued", "notesCiphertext", "notesKid") VALUES (\'app-id\', \'r1\', \'emp_0\', 1, 1, 1, \'\', \'\')'
+        )
+    write_pay_run(backend, "r1", _payslips(1))
+    rows = backend.conn.execute('SELECT "id", "grossPay" FROM "Payslip"').fetchall()
+    assert rows == [("app-id", 2400.0)]
+
+
+def test_failed_run_rolls_back_whole_transaction():
+    backend = _backend()
+    rows = _payslips(5).to_dict("records")
+    rows[4]["grossPay"] = "not a number"
+    with pytest.raises(ValueError):
+        write_pay_run(backend, "r1", rows, batch_size=2)
+    assert _count(backend) == 0
+
+
+def _add_draft_run(conn, run_id="r1"):
+    with conn:
+        conn.execute(
+            'INSERT INTO "PayRun" ("id", "orgId", "periodStart", "periodEnd", "paymentDate", "status") '
+            "VALUES (?, 'org_1', '2025-07-01', '2025-07-14', '2025-07-17', 'draft')", (run_id,)
+        )
+
+
+def test_duplicate_employee_is_rejected():
+    backend = _backend()
+    rows = _payslips(3).to_dict("records")
+    rows.append(dict(rows[1], grossPay=1.0))
+    with pytest.raises(ValueError, match="emp_1 appears more than once"):
+        write_pay_run(backend, "r1", rows, batch_size=2)
+    assert _count(backend) == 0
+
+
+def test_refuses_to_rewrite_committed_run():
+    backend = _backend()
+    _add_draft_run(backend.conn)
+    write_pay_run(backend, "r1", _payslips(3))
+    with backend.conn:
+        backend.conn.execute('UPDATE "PayRun" SET "status" = \'committed\' WHERE "id" = \'r1\'')
+
+    with pytest.raises(ValueError, match="committed"):
+        write_pay_run(backend, "r1", _payslips(3, gross=9999.0))
+    assert backend.conn.execute('SELECT MAX("grossPay") FROM "Payslip"').fetchone()[0] == 2400.0
+
+
+def test_status_check_holds_write_lock_until_commit(tmp_path):
+    db = tmp_path / "payroll.db"
+    backend = SqliteBackend.open(db)
+    _add_draft_run(backend.conn)
+    other = sqlite3.connect(db, timeout=0)
+    blocked = []
+
+    class Probe(SqliteBackend):
+        def run_status(self, pay_run_id):
+            status = super().run_status(pay_run_id)
+            assert self.conn.in_transaction
+            try:
+                with other:
+                    other.execute('UPDATE "PayRun" SET "status" = \'committed\' WHERE "id" = \'r1\'')
+            except sqlite3.OperationalError as exc:
+                blocked.append(str(exc))
+            return status
+
+    write_pay_run(Probe(backend.conn), "r1", _payslips(3))
+    assert blocked and "locked" in blocked[0]
+    assert other.execute('SELECT "status" FROM "PayRun"').fetchone()[0] == "draft"
+    assert other.execute('SELECT COUNT(*) FROM "Payslip"').fetchone()[0] == 3
+
+
+def test_incomplete_backend_fails_at_construction():
+    class NoWrites(PayslipBackend):
+        def transaction(self):
+            return contextlib.nullcontext()
+
+    with pytest.raises(TypeError, match="write_batch"):
+        NoWrites()
@@ -0,0 +1,110 @@
+from pathlib import Path
+import hashlib
+import json
+import sys
+import threading
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))  # allow "tools/..." import
+
+from tools.table_publish import PUBLISHED, VERSIONS, prune, publish, resolve_current
+
+
+def _sources(tmp_path, tag):
+    src = tmp_path / f"src-{tag}"
+    src.mkdir()
+    (src / "normalized.csv").write_bytes(f"income,withholding_weekly\n0,{tag}\n".encode())
+    (src / "banded.csv").write_bytes(f"period,lower\nweekly,{tag}\n".encode())
+    (src / "compiled.bin").write_bytes(b"\x00\xff\r\n" * 10)
+    return {p.name: p for p in src.iterdir()}
+
+
+def test_publish_switches_whole_set(tmp_path):
+    root = tmp_path / "pub"
+    first = publish(root, _sources(tmp_path, "1"), chunk_size=4)
+    assert resolve_current(root) == first.path.resolve()
+    assert (root / "current" / "normalized.csv").read_text().endswith("0,1\n")
+
+    second = publish(root, _sources(tmp_path, "2"), chunk_size=4)
+    pinned = resolve_current(root)
+    assert pinned == second.path.resolve()
+    assert (pinned / "banded.csv").read_text().endswith("weekly,2\n")
+    assert (first.path / "banded.csv").read_text().endswith("weekly,1\n")
+
+    manifest = json.loads((pinned / PUBLISHED).read_text())
+    digest = hashlib.sha256((pinned / "compiled.bin").read_bytes()).hexdigest()
+    assert manifest["files"]["compiled.bin"] == digest
+
+
+def test_invalid_text_leaves_current_untouched(tmp_path):
+    root = tmp_path / "pub"
+    good = publish(root, _sources(tmp_path, "1"))
+    files = _sources(tmp_path, "2")
+    files["normalized.csv"].write_bytes(b"income\r\n0\r\n")
+
+    with pytest.raises(ValueError, match="CR character at offset 6"):
+        publish(root, files, chunk_size=3)
+
+    assert resolve_current(root) == good.path.resolve()
+    assert [p.name for p in (root / VERSIONS).iterdir()] == [good.version]
+
+
+def test_prunes_old_versions_but_keeps_current(tmp_path):
+    root = tmp_path / "pub"
+    results = [publish(root, _sources(tmp_path, str(i)), keep=2) for i in range(4)]
+    remaining = sorted(p.name for p in (root / VERSIONS).iterdir())
+    assert remaining == [r.version for r in results[-2:]]
+    assert results[-1].pruned == [results[1].version]
+    assert resolve_current(root) == results[-1].path.resolve()
+
+
+def test_concurrent_publishes_are_serialised(tmp_path):
+    root = tmp_path / "pub"
+    errors = []
+
+    def worker(tag):
+        try:
+            for i in range(5):
+                publish(root, _sources(tmp_path, f"{tag}{i}"), keep=2)
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in "ab"]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    remaining = sorted(p.name for p in (root / VERSIONS).iterdir())
+    assert len(remaining) == 2
+    assert resolve_current(root).name == remaining[-1]
+
+
+def test_refuses_real_current_directory_before_staging(tmp_path):
+    root = tmp_path / "pub"
+    (root / "current").mkdir(parents=True)
+    with pytest.raises(FileExistsError, match="not a symlink"):
+        publish(root, _sources(tmp_path, "1"))
+    assert not (root / VERSIONS).exists()
+
+
+def test_prunes_orphaned_staging_dirs(tmp_path):
+    root = tmp_path / "pub"
+    orphan = root / VERSIONS / ".staging-20250101T000000000000Z-999999999"
+    (orphan / "normalized.csv").parent.mkdir(parents=True)
+    (orphan / "normalized.csv").write_text("partial")
+
+    publish(root, _sources(tmp_path, "1"))
+    assert not orphan.exists()
+
+
+def test_keep_below_two_is_rejected(tmp_path):
+    root = tmp_path / "pub"
+    with pytest.raises(ValueError, match="keep must be >= 2"):
+        publish(root, _sources(tmp_path, "1"), keep=1)
+    assert not (root / VERSIONS).exists()
+    with pytest.raises(ValueError, match="keep must be >= 2"):
+        prune(root, keep=0)
@@ -1,4 +1,5 @@
 from pathlib import Path
+import numpy as np
 import pandas as pd
 
 # Repo root: .../APGMS-Final/APGMS-Final
@@ -24,6 +25,21 @@ def _nearest_weekly(amount: float) -> int:
         row = df.head(1)
     return int(row["withholding_weekly"].iloc[0])
 
+def weekly_withheld_array(amounts) -> np.ndarray:
+    """
+    Vectorised _nearest_weekly: one searchsorted over the table instead of a
+    filter per amount. Amounts above the table's top income are NaN rather
+    than priced at the top row.
+    """
+    df = _get_df()
+    incomes = df["income"].to_numpy(dtype=float)
+    weekly = df["withholding_weekly"].to_numpy(dtype=float)
+    amounts = np.asarray(amounts, dtype=float)
+    idx = np.searchsorted(incomes, amounts, side="right") - 1
+    out = weekly[np.clip(idx, 0, len(weekly) - 1)]
+    out[amounts > incomes[-1]] = np.nan
+    return out
+
 def withheld(amount: float, period: str="weekly") -> int:
     w = _nearest_weekly(amount)
     if period == "weekly":
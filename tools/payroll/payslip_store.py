@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Bulk persistence of computed payslips into the "Payslip" table.
+
+A pay run is written in batches of `batch_size` rows through executemany,
+inside a single transaction, so readers never see a half-written run and a
+failed run leaves nothing behind.
+
+Rows are upserted on the unique (payRunId, employeeId) index, and payslips
+of that run for employees absent from the new set are deleted in the same
+transaction. Retrying a pay run (after a crash, or with recomputed amounts)
+therefore leaves exactly the new set, whoever wrote the earlier rows. New
+rows get an id derived from (payRunId, employeeId).
+
+Only draft runs can be (re)written: once a PayRun is committed its payslips
+are immutable, which is what lets ytd_reconcile fold each committed run
+exactly once.
+
+Backends are pluggable: subclass PayslipBackend. SqliteBackend is the local
+stand-in for Postgres. Its ON CONFLICT ("payRunId", "employeeId") upsert
+needs a unique index on that pair; 20251101_add_payroll.sql does not have
+one, so a Postgres database must first apply the Prisma migration
+20261019000000_payslip_run_employee_unique.
+
+Usage (synthetic throughput check):
+  python tools/payroll/payslip_store.py --sqlite payroll.db --employees 100000 --batch-size 10000
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import pathlib
+import sqlite3
+import sys
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple, Union
+
+import pandas as pd
+
+ROOT = pathlib.Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))  # allow "tools/..." import when run as a script
+
+from tools.payroll.schema import create_sqlite_schema
+
+BATCH_SIZE = 5_000
+
+# Fixed namespace so the same (payRunId, employeeId) always maps to the same new Payslip id.
+PAYSLIP_NAMESPACE = uuid.UUID("6f1c7a52-3b8e-5d0a-9c41-2e7d8b0f4a63")
+
+PAYSLIP_COLS = ["employeeId", "grossPay", "paygWithheld", "superAccrued", "notesCiphertext", "notesKid"]
+
+UPSERT_SQL = (
+    'INSERT INTO "Payslip" ("id", "payRunId", "employeeId", "grossPay", "paygWithheld", '
+    '"superAccrued", "notesCiphertext", "notesKid") VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+    'ON CONFLICT ("payRunId", "employeeId") DO UPDATE SET '
+    '"grossPay" = excluded."grossPay", "paygWithheld" = excluded."paygWithheld", '
+    '"superAccrued" = excluded."superAccrued", "notesCiphertext" = excluded."notesCiphertext", '
+    '"notesKid" = excluded."notesKid"'
+)
+
+Row = Tuple[str, str, str, float, float, float, str, str]
+
+
+def payslip_id(pay_run_id: str, employee_id: str) -> str:
+    """Deterministic Payslip id for rows this module inserts."""
+    return str(uuid.uuid5(PAYSLIP_NAMESPACE, f"{pay_run_id}/{employee_id}"))
+
+
+@dataclass
+class WriteStats:
+    rows: int = 0
+    batches: int = 0
+    deleted: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+
+class PayslipBackend(ABC):
+    """Interface: one transaction per pay run, many batches per transaction."""
+
+    @abstractmethod
+    def transaction(self) -> contextlib.AbstractContextManager:
+        ...
+
+    @abstractmethod
+    def run_status(self, pay_run_id: str) -> Optional[str]:
+        """PayRun.status inside the current transaction (Postgres: SELECT ... FOR UPDATE), or None."""
+
+    @abstractmethod
+    def write_batch(self, rows: Sequence[Row]) -> None:
+        ...
+
+    @abstractmethod
+    def delete_except(self, pay_run_id: str, employee_ids: Set[str]) -> int:
+        """Delete the run's payslips whose employeeId is not in employee_ids; returns rows deleted."""
+
+
+class SqliteBackend(PayslipBackend):
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    @classmethod
+    def open(cls, path: Union[str, pathlib.Path]) -> "SqliteBackend":
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        create_sqlite_schema(conn)
+        return cls(conn)
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[None]:
+        # sqlite3 only opens a transaction at the first INSERT/UPDATE/DELETE;
+        # BEGIN IMMEDIATE takes the write lock up front so run_status() and the
+        # writes see the same PayRun state.
+        if self.conn.in_transaction:
+            raise RuntimeError("connection already has an open transaction; commit it before writing a pay run")
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.conn.rollback()
+            raise
+        self.conn.commit()
+
+    def run_status(self, pay_run_id: str) -> Optional[str]:
+        row = self.conn.execute('SELECT "status" FROM "PayRun" WHERE "id" = ?', (pay_run_id,)).fetchone()
+        return row[0] if row else None
+
+    def write_batch(self, rows: Sequence[Row]) -> None:
+        self.conn.executemany(UPSERT_SQL, rows)
+
+    def delete_except(self, pay_run_id: str, employee_ids: Set[str]) -> int:
+        existing = self.conn.execute(
+            'SELECT "employeeId" FROM "Payslip" WHERE "payRunId" = ?', (pay_run_id,)
+        ).fetchall()
+        stale = [(pay_run_id, e) for (e,) in existing if e not in employee_ids]
+        self.conn.executemany('DELETE FROM "Payslip" WHERE "payRunId" = ? AND "employeeId" = ?', stale)
+        return len(stale)
+
+
+def _rows(pay_run_id: str, payslips: Union[pd.DataFrame, Iterable[Mapping[str, Any]]]) -> Iterator[Row]:
+    if isinstance(payslips, pd.DataFrame):
+        missing = [c for c in PAYSLIP_COLS if c not in payslips.columns]
+        if missing:
+            raise ValueError(f"payslips missing columns: {missing}")
+        records: Iterable[Tuple] = zip(*(payslips[c].tolist() for c in PAYSLIP_COLS))
+    else:
+        records = (tuple(p[c] for c in PAYSLIP_COLS) for p in payslips)
+
+    for emp, gross, payg, sup, notes, kid in records:
+        emp = str(emp)
+        yield (payslip_id(pay_run_id, emp), pay_run_id, emp,
+               round(float(gross), 2), round(float(payg), 2), round(float(sup), 2),
+               str(notes), str(kid))
+
+
+def write_pay_run(
+    backend: PayslipBackend,
+    pay_run_id: str,
+    payslips: Union[pd.DataFrame, Iterable[Mapping[str, Any]]],
+    batch_size: int = BATCH_SIZE,
+) -> WriteStats:
+    """Replace the payslips of one pay run in batches, in a single transaction."""
+    if batch_size < 1:
+        raise ValueError("batch_size must be >= 1")
+
+    stats = WriteStats()
+    t0 = time.perf_counter()
+    with backend.transaction():
+        if backend.run_status(pay_run_id) == "committed":
+            raise ValueError(f"pay run {pay_run_id} is committed; its payslips can no longer be written")
+        written: Set[str] = set()
+        batch: List[Row] = []
+        for row in _rows(pay_run_id, payslips):
+            if row[2] in written:
+                raise ValueError(f"employee {row[2]} appears more than once in pay run {pay_run_id}")
+            written.add(row[2])
+            batch.append(row)
+            if len(batch) >= batch_size:
+                backend.write_batch(batch)
+                stats.rows += len(batch)
+                stats.batches += 1
+                batch = []
+        if batch:
+            backend.write_batch(batch)
+            stats.rows += len(batch)
+            stats.batches += 1
+        stats.deleted = backend.delete_except(pay_run_id, written)
+    stats.seconds = time.perf_counter() - t0
+    return stats
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Write a synthetic pay run and report payslip throughput")
+    ap.add_argument("--sqlite", type=pathlib.Path, required=True, help="SQLite database (created if missing)")
+    ap.add_argument("--pay-run", default="bench_run", help="payRunId to write")
+    ap.add_argument("--employees", type=int, default=100_000)
+    ap.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = ap.parse_args()
+
+    n = args.employees
+    payslips = pd.DataFrame({
+        "employeeId": [f"emp_{i}" for i in range(n)],
+        "grossPay": 2400.0,
+        "paygWithheld": 366.0,
+        "superAccrued": 276.0,
+        "notesCiphertext": "",
+        "notesKid": "",
+    })
+
+    backend = SqliteBackend.open(args.sqlite)
+    try:
+        stats = write_pay_run(backend, args.pay_run, payslips, args.batch_size)
+    finally:
+        backend.conn.close()
+    print(f"WROTE {stats.rows} payslip(s) for {args.pay_run} in {stats.batches} batch(es), "
+          f"{stats.seconds:.2f}s, {stats.rows_per_sec:,.0f} rows/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+SQLite stand-in for the payroll tables in 20251101_add_payroll.sql.
+
+Column names and quoting match the Postgres migration so the same SQL text
+works against both. SQLite has no TIMESTAMP WITH TIME ZONE / NUMERIC(12,2)
+or NOW(), so timestamps are ISO-8601 TEXT and money columns are NUMERIC.
+
+Payslip also gets the unique (payRunId, employeeId) index that payslip_store
+upserts against. In Postgres it comes from the Prisma migration
+20261019000000_payslip_run_employee_unique, not 20251101_add_payroll.sql.
+"""
+from __future__ import annotations
+
+import sqlite3
+
+SQLITE_DDL = """
+CREATE TABLE IF NOT EXISTS "Employee" (
+  "id" TEXT PRIMARY KEY,
+  "orgId" TEXT NOT NULL,
+  "fullNameCiphertext" TEXT NOT NULL,
+  "fullNameKid" TEXT NOT NULL,
+  "tfnProvided" BOOLEAN NOT NULL DEFAULT 0,
+  "employmentType" TEXT NOT NULL,
+  "baseRate" NUMERIC NOT NULL DEFAULT 0,
+  "superRate" NUMERIC NOT NULL DEFAULT 11.0,
+  "status" TEXT NOT NULL DEFAULT 'active',
+  "createdAt" TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS "PayRun" (
+  "id" TEXT PRIMARY KEY,
+  "orgId" TEXT NOT NULL,
+  "periodStart" TEXT NOT NULL,
+  "periodEnd" TEXT NOT NULL,
+  "paymentDate" TEXT NOT NULL,
+  "status" TEXT NOT NULL DEFAULT 'draft',
+  "createdAt" TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS "Payslip" (
+  "id" TEXT PRIMARY KEY,
+  "payRunId" TEXT NOT NULL REFERENCES "PayRun"("id") ON DELETE CASCADE,
+  "employeeId" TEXT NOT NULL REFERENCES "Employee"("id") ON DELETE CASCADE,
+  "grossPay" NUMERIC NOT NULL,
+  "paygWithheld" NUMERIC NOT NULL,
+  "superAccrued" NUMERIC NOT NULL,
+  "notesCiphertext" TEXT NOT NULL,
+  "notesKid" TEXT NOT NULL,
+  "createdAt" TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS "Employee_orgId_idx" ON "Employee"("orgId");
+CREATE INDEX IF NOT EXISTS "PayRun_orgId_idx" ON "PayRun"("orgId");
+CREATE INDEX IF NOT EXISTS "Payslip_payRunId_idx" ON "Payslip"("payRunId");
+CREATE INDEX IF NOT EXISTS "Payslip_employeeId_idx" ON "Payslip"("employeeId");
+CREATE UNIQUE INDEX IF NOT EXISTS "Payslip_payRunId_employeeId_key" ON "Payslip"("payRunId", "employeeId");
+"""
+
+def create_sqlite_schema(conn: sqlite3.Connection) -> None:
+    conn.executescript(SQLITE_DDL)
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Year-to-date PAYG reconciliation across committed pay runs.
+
+Rolls each employee's grossPay and paygWithheld up across a financial year
+and compares the withheld total against the annualised liability from the
+normalized PAYG table, flagging over- and under-withholding.
+
+Payslips are read in chunks (SQLite stand-in for the Postgres schema in
+20251101_add_payroll.sql, or CSV exports of PayRun/Payslip) and folded with
+a columnar group-by per chunk, so memory is bounded by the number of
+employees rather than the number of payslips.
+
+Incremental mode keeps the per-employee totals plus the ids of pay runs
+already folded in a state file; a later run only reads newly committed runs.
+That relies on committed runs being immutable, which payslip_store enforces
+by refusing to write into a committed PayRun.
+
+PayRun.paymentDate is TIMESTAMP WITH TIME ZONE, so runs are assigned to a
+financial year by their payment date in --tz (Australia/Sydney by default),
+not by the date printed in the stored value. Values without an offset are
+taken to be local time already.
+
+Usage:
+  python tools/payroll/ytd_reconcile.py --sqlite payroll.db --org org_1 --fy 2026
+  python tools/payroll/ytd_reconcile.py --payruns PayRun.csv --payslips Payslip.csv \\
+      --org org_1 --fy 2026 --state ytd_state.json --out ytd_report.csv
+"""
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import os
+import pathlib
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+ROOT = pathlib.Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))  # allow "tools/..." import when run as a script
+
+from tools.ato_scraper.payg_resolver import weekly_withheld_array
+
+CHUNKSIZE = 250_000
+PERIODS_PER_YEAR = 26  # fortnightly
+TOLERANCE = 1.0        # dollars of YTD variance ignored as rounding
+TIMEZONE = "Australia/Sydney"
+
+TOTAL_COLS = ["gross_pay", "payg_withheld", "payslips"]
+
+
+def financial_year_bounds(fy: int) -> Tuple[str, str]:
+    """ATO convention: FY2026 runs 2025-07-01 up to (not including) 2026-07-01."""
+    return f"{fy - 1:04d}-07-01", f"{fy:04d}-07-01"
+
+
+def empty_totals() -> pd.DataFrame:
+    df = pd.DataFrame({
+        "gross_pay": pd.Series(dtype=float),
+        "payg_withheld": pd.Series(dtype=float),
+        "payslips": pd.Series(dtype=np.int64),
+    })
+    df.index.name = "employeeId"
+    return df
+
+
+@dataclass
+class YtdState:
+    financial_year: int
+    org_id: str
+    totals: pd.DataFrame = field(default_factory=empty_totals)
+    folded_run_ids: Set[str] = field(default_factory=set)
+
+    def save(self, path: pathlib.Path) -> None:
+        payload = {
+            "financial_year": self.financial_year,
+            "org_id": self.org_id,
+            "folded_run_ids": sorted(self.folded_run_ids),
+            "employee_ids": self.totals.index.tolist(),
+            "gross_pay": self.totals["gross_pay"].round(2).tolist(),
+            "payg_withheld": self.totals["payg_withheld"].round(2).tolist(),
+            "payslips": self.totals["payslips"].astype(int).tolist(),
+        }
+        # temp file + fsync + rename: a crash mid-save leaves the previous state intact
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.tmp-{os.getpid()}")
+        try:
+            with tmp.open("w", encoding="utf-8") as f:
+                json.dump(payload, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+    @classmethod
+    def load(cls, path: pathlib.Path) -> "YtdState":
+        payload = json.loads(path.read_text(encoding="utf-8"))
+        totals = pd.DataFrame(
+            {
+                "gross_pay": np.asarray(payload["gross_pay"], dtype=float),
+                "payg_withheld": np.asarray(payload["payg_withheld"], dtype=float),
+                "payslips": np.asarray(payload["payslips"], dtype=np.int64),
+            },
+            index=pd.Index(payload["employee_ids"], name="employeeId"),
+        )
+        return cls(int(payload["financial_year"]), str(payload["org_id"]), totals,
+                   set(payload["folded_run_ids"]))
+
+
+def open_state(path: Optional[pathlib.Path], org_id: str, fy: int) -> YtdState:
+    """Load incremental state if present, refusing one written for another org or FY."""
+    if path is None or not path.exists():
+        return YtdState(fy, org_id)
+    state = YtdState.load(path)
+    if state.financial_year != fy:
+        raise SystemExit(f"ERROR: state {path} is for FY{state.financial_year}, not FY{fy}")
+    if state.org_id != org_id:
+        raise SystemExit(f"ERROR: state {path} is for org {state.org_id!r}, not {org_id!r}")
+    return state
+
+
+# ---------------------------------------------------------------------------
+# Sources
+# ---------------------------------------------------------------------------
+
+def local_payment_time(value: str, tz: str = TIMEZONE) -> datetime.datetime:
+    """Parse an ISO-8601 paymentDate and express it in `tz`; naive values are already local."""
+    zone = ZoneInfo(tz)
+    ts = datetime.datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    return ts.replace(tzinfo=zone) if ts.tzinfo is None else ts.astimezone(zone)
+
+
+def _runs_in_financial_year(runs: pd.DataFrame, fy: int, tz: str) -> List[str]:
+    """runs: committed PayRun rows (id, paymentDate) for one org; returns ids paid in FY, in payment order."""
+    start, end = financial_year_bounds(fy)
+    local = [local_payment_time(v, tz) for v in runs["paymentDate"]]
+    picked = [(ts, run_id) for ts, run_id in zip(local, runs["id"]) if start <= ts.date().isoformat() < end]
+    return [run_id for _, run_id in sorted(picked)]
+
+
+def committed_run_ids_sqlite(conn: sqlite3.Connection, org_id: str, fy: int, tz: str = TIMEZONE) -> List[str]:
+    runs = pd.read_sql_query(
+        'SELECT "id", "paymentDate" FROM "PayRun" WHERE "orgId" = ? AND "status" = \'committed\'',
+        conn, params=(org_id,),
+    )
+    return _runs_in_financial_year(runs, fy, tz)
+
+
+def iter_payslip_chunks_sqlite(
+    conn: sqlite3.Connection, run_ids: Iterable[str], chunksize: int = CHUNKSIZE
+) -> Iterator[pd.DataFrame]:
+    """Stream (employeeId, grossPay, paygWithheld) for the given runs."""
+    conn.execute('CREATE TEMP TABLE IF NOT EXISTS "_ytd_runs" ("id" TEXT PRIMARY KEY)')
+    conn.execute('DELETE FROM "_ytd_runs"')
+    conn.executemany('INSERT OR IGNORE INTO "_ytd_runs" ("id") VALUES (?)', ((r,) for r in run_ids))
+    sql = (
+        'SELECT s."employeeId", s."grossPay", s."paygWithheld" FROM "Payslip" s '
+        'JOIN "_ytd_runs" r ON r."id" = s."payRunId"'
+    )
+    try:
+        yield from pd.read_sql_query(sql, conn, chunksize=chunksize)
+    finally:
+        conn.execute('DELETE FROM "_ytd_runs"')
+
+
+def committed_run_ids_csv(payruns_csv: pathlib.Path, org_id: str, fy: int, tz: str = TIMEZONE) -> List[str]:
+    runs = pd.read_csv(payruns_csv, usecols=["id", "orgId", "paymentDate", "status"], dtype=str)
+    runs = runs[(runs["orgId"] == org_id) & (runs["status"] == "committed")]
+    return _runs_in_financial_year(runs, fy, tz)
+
+
+def iter_payslip_chunks_csv(
+    payslips_csv: pathlib.Path, run_ids: Iterable[str], chunksize: int = CHUNKSIZE
+) -> Iterator[pd.DataFrame]:
+    wanted = pd.Index(list(run_ids))
+    reader = pd.read_csv(
+        payslips_csv,
+        usecols=["payRunId", "employeeId", "grossPay", "paygWithheld"],
+        dtype={"payRunId": str, "employeeId": str, "grossPay": float, "paygWithheld": float},
+        chunksize=chunksize,
+    )
+    for chunk in reader:
+        chunk = chunk[chunk["payRunId"].isin(wanted)]
+        if not chunk.empty:
+            yield chunk[["employeeId", "grossPay", "paygWithheld"]]
+
+
+# ---------------------------------------------------------------------------
+# Folding + reconciliation
+# ---------------------------------------------------------------------------
+
+def fold_chunks(chunks: Iterable[pd.DataFrame], totals: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Group each chunk by employee and add it onto the running totals."""
+    totals = empty_totals() if totals is None else totals
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        part = chunk.groupby("employeeId", sort=False).agg(
+            gross_pay=("grossPay", "sum"),
+            payg_withheld=("paygWithheld", "sum"),
+            payslips=("grossPay", "size"),
+        )
+        totals = totals.add(part, fill_value=0)
+    totals["payslips"] = totals["payslips"].astype(np.int64)
+    return totals[TOTAL_COLS]
+
+
+def reconcile(
+    totals: pd.DataFrame,
+    periods_per_year: int = PERIODS_PER_YEAR,
+    tolerance: float = TOLERANCE,
+) -> pd.DataFrame:
+    """
+    Annualise each employee's YTD gross, price it against the weekly PAYG
+    table, and pro-rate the annual liability back to the periods paid so far.
+    variance > 0 means more was withheld than the table expects.
+    Employees whose annualised weekly income is above the table's range
+    cannot be priced: their liability/expected/variance are NaN and their
+    status is "unpriced".
+    """
+    gross = totals["gross_pay"].to_numpy(dtype=float)
+    withheld_ytd = totals["payg_withheld"].to_numpy(dtype=float)
+    periods = totals["payslips"].to_numpy(dtype=float)
+
+    safe_periods = np.where(periods > 0, periods, 1.0)
+    annual_gross = gross / safe_periods * periods_per_year
+    annual_liability = weekly_withheld_array(annual_gross / 52.0) * 52.0
+    expected_ytd = np.round(annual_liability * periods / periods_per_year, 2)
+    variance = np.round(withheld_ytd - expected_ytd, 2)
+
+    status = np.where(variance > tolerance, "over", np.where(variance < -tolerance, "under", "ok"))
+    status = np.where(np.isnan(annual_liability), "unpriced", status)
+
+    report = totals.copy()
+    report["annualised_gross"] = np.round(annual_gross, 2)
+    report["annualised_liability"] = annual_liability
+    report["expected_ytd"] = expected_ytd
+    report["variance"] = variance
+    report["status"] = status
+    return report
+
+
+def update_state_sqlite(
+    state: YtdState, conn: sqlite3.Connection, chunksize: int = CHUNKSIZE, tz: str = TIMEZONE
+) -> List[str]:
+    """Fold committed runs of state.org_id not yet in state; returns the ids that were folded."""
+    new_runs = [r for r in committed_run_ids_sqlite(conn, state.org_id, state.financial_year, tz)
+                if r not in state.folded_run_ids]
+    if new_runs:
+        state.totals = fold_chunks(iter_payslip_chunks_sqlite(conn, new_runs, chunksize), state.totals)
+        state.folded_run_ids.update(new_runs)
+    return new_runs
+
+
+def update_state_csv(
+    state: YtdState,
+    payruns_csv: pathlib.Path,
+    payslips_csv: pathlib.Path,
+    chunksize: int = CHUNKSIZE,
+    tz: str = TIMEZONE,
+) -> List[str]:
+    new_runs = [r for r in committed_run_ids_csv(payruns_csv, state.org_id, state.financial_year, tz)
+                if r not in state.folded_run_ids]
+    if new_runs:
+        state.totals = fold_chunks(iter_payslip_chunks_csv(payslips_csv, new_runs, chunksize), state.totals)
+        state.folded_run_ids.update(new_runs)
+    return new_runs
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="YTD PAYG reconciliation across committed pay runs")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--sqlite", type=pathlib.Path, help="SQLite database with PayRun/Payslip tables")
+    src.add_argument("--payruns", type=pathlib.Path, help="PayRun CSV export (requires --payslips)")
+    ap.add_argument("--payslips", type=pathlib.Path, help="Payslip CSV export")
+    ap.add_argument("--org", required=True, help="orgId to reconcile")
+    ap.add_argument("--fy", type=int, required=True, help="Financial year, e.g. 2026 for 2025-07-01..2026-06-30")
+    ap.add_argument("--state", type=pathlib.Path, help="Incremental state file (read if present, then rewritten)")
+    ap.add_argument("--out", type=pathlib.Path, help="Write the per-employee report CSV here")
+    ap.add_argument("--periods-per-year", type=int, default=PERIODS_PER_YEAR)
+    ap.add_argument("--tolerance", type=float, default=TOLERANCE)
+    ap.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    ap.add_argument("--tz", default=TIMEZONE, help=f"Timezone deciding a run's payment date (default: {TIMEZONE})")
+    args = ap.parse_args()
+
+    if args.payruns and not args.payslips:
+        ap.error("--payruns requires --payslips")
+
+    state = open_state(args.state, args.org, args.fy)
+
+    t0 = time.perf_counter()
+    if args.sqlite:
+        with sqlite3.connect(args.sqlite) as conn:
+            folded = update_state_sqlite(state, conn, args.chunksize, args.tz)
+    else:
+        folded = update_state_csv(state, args.payruns, args.payslips, args.chunksize, args.tz)
+    report = reconcile(state.totals, args.periods_per_year, args.tolerance)
+    elapsed = time.perf_counter() - t0
+
+    if args.state:
+        state.save(args.state)
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        report.to_csv(args.out)
+        print(f"WROTE {args.out}")
+
+    counts = report["status"].value_counts()
+    print(f"FY{args.fy} org={args.org}: folded {len(folded)} new run(s), "
+          f"{len(state.folded_run_ids)} total, {len(report)} employee(s) in {elapsed:.2f}s")
+    print(f"over: {int(counts.get('over', 0))}  under: {int(counts.get('under', 0))}  "
+          f"ok: {int(counts.get('ok', 0))}  unpriced: {int(counts.get('unpriced', 0))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Publish a set of table files (normalized CSV, banded CSV, manifest, compiled
+artifacts) as one atomic version.
+
+Layout under --root:
+  versions/<version>/<files...>, PUBLISHED.json
+  current -> versions/<version>     (relative symlink)
+
+Each source is streamed in fixed-size chunks into a staging directory, so
+memory stays bounded regardless of file size. Text files (by suffix) get the
+same checks as scripts/atomic-write.py (no NUL, LF only, ASCII only) during
+the copy; every file is hashed and fsynced. The staging directory is renamed
+into versions/, then `current` is swapped with a single rename of a new
+symlink over the old one. Readers that resolve `current` once (see
+resolve_current) always see one complete set, never a mix.
+
+Old versions beyond --keep are pruned after the swap, along with staging
+directories left behind by killed publishers. --keep must be at least 2, so
+the version a reader pinned just before a swap survives it; such a reader
+stays valid until keep - 1 further publishes. The whole
+stage -> swap -> prune sequence holds an flock on <root>/.publish.lock, so
+concurrent publishers run one after another. POSIX only (needs symlinks,
+flock and directory fsync).
+
+Usage:
+  python tools/table_publish.py --root data/external/ato/payg/published \\
+      data/external/ato/payg/payg_tables_normalized.csv \\
+      data/external/ato/payg/payg_tables_banded.csv
+  python tools/table_publish.py --root out manifest.json=build/manifest.json
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import datetime
+import fcntl
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+import sys
+from dataclasses import dataclass, field
+from typing import BinaryIO, Dict, Iterator, List, Mapping, Union
+
+CHUNK_SIZE = 1 << 20
+KEEP = 3
+MIN_KEEP = 2
+STAGING_PREFIX = ".staging-"
+TEXT_SUFFIXES = {".csv", ".json", ".txt", ".md"}
+CURRENT = "current"
+VERSIONS = "versions"
+PUBLISHED = "PUBLISHED.json"
+LOCK = ".publish.lock"
+
+
+@dataclass
+class PublishResult:
+    version: str
+    path: pathlib.Path
+    files: Dict[str, str] = field(default_factory=dict)  # name -> sha256
+    pruned: List[str] = field(default_factory=list)
+
+
+def validate_chunk(chunk: bytes, offset: int) -> None:
+    """Chunked equivalent of atomic-write.py's validate_content; offset is for error messages."""
+    pos = chunk.find(b"\x00")
+    if pos != -1:
+        raise ValueError(f"contains NUL byte at offset {offset + pos}")
+    pos = chunk.find(b"\r")
+    if pos != -1:
+        raise ValueError(f"contains CR character at offset {offset + pos}; expected LF only")
+    if not chunk.isascii():
+        pos = next(i for i, b in enumerate(chunk) if b > 0x7F)
+        raise ValueError(f"is not ASCII-only: byte 0x{chunk[pos]:02x} at offset {offset + pos}")
+
+
+def _fsync_dir(path: pathlib.Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _copy_stream(src: BinaryIO, dst: BinaryIO, validate: bool, chunk_size: int) -> str:
+    digest = hashlib.sha256()
+    offset = 0
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            break
+        if validate:
+            validate_chunk(chunk, offset)
+        digest.update(chunk)
+        dst.write(chunk)
+        offset += len(chunk)
+    dst.flush()
+    os.fsync(dst.fileno())
+    return digest.hexdigest()
+
+
+def resolve_current(root: Union[str, pathlib.Path]) -> pathlib.Path:
+    """Pin the currently published version directory; read all files from the returned path."""
+    return pathlib.Path(os.path.realpath(pathlib.Path(root) / CURRENT))
+
+
+def _new_version(versions: pathlib.Path) -> str:
+    version = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    if (versions / version).exists():
+        raise FileExistsError(f"version already exists: {versions / version}")
+    return version
+
+
+@contextlib.contextmanager
+def _publish_lock(root: pathlib.Path) -> Iterator[None]:
+    """Serialise stage -> swap -> prune across processes sharing `root`."""
+    root.mkdir(parents=True, exist_ok=True)
+    with (root / LOCK).open("a") as lock:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+
+def _check_keep(keep: int) -> None:
+    if keep < MIN_KEEP:
+        raise ValueError(f"keep must be >= {MIN_KEEP} so a version pinned before the swap is not removed")
+
+
+def _prune_locked(root: pathlib.Path, keep: int) -> List[str]:
+    versions = root / VERSIONS
+    current = resolve_current(root).name
+    own_suffix = f"-{os.getpid()}"
+    for p in versions.iterdir():
+        # orphaned by a killed publisher; the lock means no other process is staging now
+        if p.is_dir() and p.name.startswith(STAGING_PREFIX) and not p.name.endswith(own_suffix):
+            shutil.rmtree(p)
+    names = sorted(p.name for p in versions.iterdir() if p.is_dir() and not p.name.startswith("."))
+    stale = [n for n in names[:-keep] if n != current]
+    for name in stale:
+        shutil.rmtree(versions / name)
+    return stale
+
+
+def prune(root: Union[str, pathlib.Path], keep: int = KEEP) -> List[str]:
+    """Remove all but the newest `keep` versions; the current one is never removed."""
+    _check_keep(keep)
+    root = pathlib.Path(root)
+    with _publish_lock(root):
+        return _prune_locked(root, keep)
+
+
+def publish(
+    root: Union[str, pathlib.Path],
+    files: Mapping[str, Union[str, pathlib.Path]],
+    keep: int = KEEP,
+    chunk_size: int = CHUNK_SIZE,
+) -> PublishResult:
+    """Stage, validate and fsync `files` (published name -> source path), then swap `current`."""
+    _check_keep(keep)
+    root = pathlib.Path(root)
+    if not files:
+        raise ValueError("nothing to publish")
+    for name in files:
+        if pathlib.PurePath(name).name != name or name in ("", ".", "..", PUBLISHED):
+            raise ValueError(f"invalid published name: {name!r}")
+
+    with _publish_lock(root):
+        current = root / CURRENT
+        if current.exists() and not current.is_symlink():
+            raise FileExistsError(f"{current} exists and is not a symlink; move it aside before publishing")
+
+        versions = root / VERSIONS
+        versions.mkdir(parents=True, exist_ok=True)
+        version = _new_version(versions)
+        staging = versions / f"{STAGING_PREFIX}{version}-{os.getpid()}"
+        staging.mkdir()
+
+        result = PublishResult(version, versions / version)
+        try:
+            for name, source in files.items():
+                source = pathlib.Path(source)
+                validate = source.suffix.lower() in TEXT_SUFFIXES
+                with source.open("rb") as src, (staging / name).open("xb") as dst:
+                    try:
+                        result.files[name] = _copy_stream(src, dst, validate, chunk_size)
+                    except ValueError as exc:
+                        raise ValueError(f"{source}: {exc}") from None
+
+            manifest = {"version": version, "files": result.files}
+            with (staging / PUBLISHED).open("x", encoding="utf-8", newline="\n") as f:
+                json.dump(manifest, f, indent=2, sort_keys=True)
+                f.write("\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+            _fsync_dir(staging)
+            os.rename(staging, result.path)
+            _fsync_dir(versions)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        link_tmp = root / f".{CURRENT}.tmp-{os.getpid()}"
+        if link_tmp.is_symlink() or link_tmp.exists():
+            link_tmp.unlink()
+        os.symlink(os.path.join(VERSIONS, version), link_tmp)
+        os.replace(link_tmp, current)
+        _fsync_dir(root)
+
+        result.pruned = _prune_locked(root, keep)
+    return result
+
+
+def _parse_file_arg(arg: str) -> tuple:
+    name, sep, path = arg.partition("=")
+    if not sep:
+        return pathlib.Path(arg).name, pathlib.Path(arg)
+    return name, pathlib.Path(path)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Atomically publish a set of table files as a new version")
+    ap.add_argument("--root", type=pathlib.Path, required=True, help="Publication root (holds versions/ and current)")
+    ap.add_argument("files", nargs="+", help="Source files, optionally as NAME=PATH to rename on publish")
+    ap.add_argument("--keep", type=int, default=KEEP, help=f"Versions to retain, at least {MIN_KEEP} (default: {KEEP})")
+    ap.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = ap.parse_args()
+    if args.keep < MIN_KEEP:
+        ap.error(f"--keep must be at least {MIN_KEEP}")
+
+    files: Dict[str, pathlib.Path] = {}
+    for arg in args.files:
+        name, path = _parse_file_arg(arg)
+        if name in files:
+            print(f"FAIL: duplicate published name {name!r}", file=sys.stderr)
+            return 1
+        if not path.is_file():
+            print(f"FAIL: source file {path} does not exist", file=sys.stderr)
+            return 1
+        files[name] = path
+
+    try:
+        result = publish(args.root, files, keep=args.keep, chunk_size=args.chunk_size)
+    except ValueError as exc:
+        print(f"FAIL: validation error: {exc}", file=sys.stderr)
+        return 2
+    except FileExistsError as exc:
+        print(f"FAIL: {exc}", file=sys.stderr)
+        return 1
+
+    print(f"OK: published {len(result.files)} file(s) as {result.path}")
+    for name in result.pruned:
+        print(f"Pruned {args.root / VERSIONS / name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())